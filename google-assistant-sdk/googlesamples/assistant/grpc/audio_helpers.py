@@ -46,7 +46,7 @@ def normalize_audio_buffer(buf, volume_percentage, sample_width=2):
     For now we only sample_width 2.
 
     Args:
-      buf: byte string containing audio data to normalize.
+      buf: bytes-like object containing audio data to normalize.
       volume_percentage: volume setting as an integer percentage (1-100).
       sample_width: size of a single sample in bytes.
     """
@@ -54,19 +54,25 @@ def normalize_audio_buffer(buf, volume_percentage, sample_width=2):
         raise Exception('unsupported sample width:', sample_width)
     scale = math.pow(2, 1.0*volume_percentage/100)-1
     # Construct array from bytes based on sample_width, multiply by scale
-    # and convert it back to bytes
-    arr = array.array('h', buf)
+    # and return a byte view of it (avoids copying it back into bytes).
+    arr = array.array('h')
+    if hasattr(arr, 'frombytes'):
+        arr.frombytes(buf)
+    else:
+        # Python 2 arrays neither take nor expose memoryviews.
+        arr.fromstring(memoryview(buf).tobytes())
     for idx in range(0, len(arr)):
         arr[idx] = int(arr[idx]*scale)
-    buf = arr.tostring()
-    return buf
+    if hasattr(arr, 'tobytes'):
+        return memoryview(arr).cast('B')
+    return arr.tostring()
 
 
 def align_buf(buf, sample_width):
     """In case of buffer size not aligned to sample_width pad it with 0s"""
     remainder = len(buf) % sample_width
     if remainder != 0:
-        buf += b'\0' * (sample_width - remainder)
+        buf = memoryview(buf).tobytes() + b'\0' * (sample_width - remainder)
     return buf
 
 
@@ -346,6 +352,11 @@ class ConversationStream(object):
     def sample_rate(self):
         return self._source._sample_rate
 
+    @property
+    def iter_size(self):
+        """Size in bytes of the chunks yielded when iterating the stream."""
+        return self._iter_size
+
 
 @click.command()
 @click.option('--record-time', default=5,
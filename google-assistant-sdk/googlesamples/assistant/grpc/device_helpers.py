@@ -76,8 +76,8 @@ class DeviceRequestHandler(object):
         fs = []
         for device in devices:
             if device[key_id_] != self.device_id:
-                logger.warning('Ignoring command for unknown device: %s'
-                               % device[key_id_])
+                logger.warning('Ignoring command for unknown device: %s',
+                               device[key_id_])
                 continue
             if not execution:
                 logger.warning('Ignoring noop execution')
@@ -90,15 +90,18 @@ class DeviceRequestHandler(object):
         return fs
 
     def dispatch_command(self, command, params=None):
-        """Dispatch device commands to the appropriate handler."""
+        """Dispatch device commands to the appropriate handler.
+
+        Returns: the value returned by the handler, if any.
+        """
         try:
             if command in self.handlers:
                 if params is None:
                     logger.warning('None params command: %s',
                                    self.handlers[command].__name__)
-                    self.handlers[command]()
+                    return self.handlers[command]()
                 else:
-                    self.handlers[command](**params)
+                    return self.handlers[command](**params)
             else:
                 logger.warning('Unsupported command: %s: %s',
                                command, params)
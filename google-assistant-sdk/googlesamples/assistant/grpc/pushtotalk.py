@@ -21,22 +21,19 @@ import logging
 import os
 import os.path
 import pathlib2 as pathlib
+import queue
 import re
 import sys
 import subprocess
+import threading
 import time
 import uuid
 
 import click
-import grpc
-import google.auth.transport.grpc
-import google.auth.transport.requests
-import google.oauth2.credentials
-
-from google.assistant.embedded.v1alpha2 import (
-    embedded_assistant_pb2,
-    embedded_assistant_pb2_grpc
-)
+
+# grpc and google.auth are imported where they are first needed
+# (SampleAssistant and main) to keep module import and --help fast.
+from google.assistant.embedded.v1alpha2 import embedded_assistant_pb2
 from tenacity import retry, stop_after_attempt, retry_if_exception
 
 try:
@@ -59,6 +56,11 @@ import synthesize_text
 
 import faasshell
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 try:
     from BMP180 import BMP180
     import dht11
@@ -75,6 +77,34 @@ DIALOG_FOLLOW_ON = embedded_assistant_pb2.DialogStateOut.DIALOG_FOLLOW_ON
 CLOSE_MICROPHONE = embedded_assistant_pb2.DialogStateOut.CLOSE_MICROPHONE
 PLAYING = embedded_assistant_pb2.ScreenOutConfig.PLAYING
 DEFAULT_GRPC_DEADLINE = 60 * 3 + 5
+# Keep the channel alive between hotword-triggered conversations so that
+# a turn after an idle period does not pay for a new TLS handshake.
+GRPC_CHANNEL_OPTIONS = [
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.keepalive_timeout_ms', 10000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+    ('grpc.http2.min_time_between_pings_ms', 10000),
+    ('grpc.max_receive_message_length', 4 * 1024 * 1024),
+]
+# Number of audio chunks sent together in a single AssistRequest. Every
+# other chunk is held back for one read period (100 ms at the default
+# --audio-iter-size), which halves the number of requests.
+AUDIO_BATCH_CHUNKS = 2
+# Maximum number of audio responses buffered ahead of playback.
+PLAYBACK_QUEUE_SIZE = 8
+# DHT11 reads are retried with exponential backoff within a time budget.
+DHT11_READ_TIMEOUT = 3.0
+DHT11_RETRY_DELAY = 0.05
+DHT11_RETRY_MAX_DELAY = 1.0
+# Japanese date such as '2018年6月21日' spoken in CommitCountReport.
+DATE_PATTERN = re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日')
+# Time of day appended to dates passed to faasshell.
+DATE_SUFFIX = 'T00:00:00+00:00'
+# GitHub owner of the repositories known to CommitCountReport.
+OWNER = {'faasshell': 'naohirotamura',
+         'buildah': 'containers',
+         'kubernetes': 'kubernetes'}
 
 logger = logging.getLogger(__name__)
 
@@ -83,6 +113,36 @@ if GPIO_FLAG:
     bmp = BMP180()
     lightsensor.setup()
 
+# Seconds during which BMP180 readings are reused instead of triggering
+# new I2C conversions.
+BMP180_CACHE_TTL = 1.0
+_bmp_cache = {'time': None, 'temperature': 0, 'pressure': 0, 'altitude': 0}
+_bmp_lock = threading.Lock()
+
+
+def read_bmp180(field):
+    """Returns a cached BMP180 reading.
+
+    Temperature and pressure are read together and the altitude is derived
+    from the pressure, so a turn asking for several of them only talks to
+    the sensor once.
+
+    Args:
+      field: one of 'temperature' (C), 'pressure' (Pa) or 'altitude' (m).
+    """
+    with _bmp_lock:
+        now = time.monotonic()
+        last = _bmp_cache['time']
+        if last is None or now - last > BMP180_CACHE_TTL:
+            pressure = float(bmp.read_pressure())
+            _bmp_cache['temperature'] = bmp.read_temperature()
+            _bmp_cache['pressure'] = pressure
+            # Same as BMP180.read_altitude(), section 3.6 of the datasheet.
+            _bmp_cache['altitude'] = 44330.0 * (
+                1.0 - pow(pressure / 101325.0, (1.0/5.255)))
+            _bmp_cache['time'] = now
+        return _bmp_cache[field]
+
 
 class SampleAssistant(object):
     """Sample Assistant that supports conversations and device actions.
@@ -118,6 +178,9 @@ class SampleAssistant(object):
         self.is_new_conversation = True
 
         # Create Google Assistant API gRPC client.
+        from google.assistant.embedded.v1alpha2 import (
+            embedded_assistant_pb2_grpc
+        )
         self.assistant = embedded_assistant_pb2_grpc.EmbeddedAssistantStub(
             channel
         )
@@ -125,15 +188,65 @@ class SampleAssistant(object):
 
         self.device_handler = device_handler
 
+        # AssistConfig sent at the beginning of each Assist() call,
+        # built once and updated in place by gen_assist_requests().
+        self.config = embedded_assistant_pb2.AssistConfig(
+            audio_in_config=embedded_assistant_pb2.AudioInConfig(
+                encoding='LINEAR16',
+                sample_rate_hertz=self.conversation_stream.sample_rate,
+            ),
+            audio_out_config=embedded_assistant_pb2.AudioOutConfig(
+                encoding='LINEAR16',
+                sample_rate_hertz=self.conversation_stream.sample_rate,
+            ),
+            dialog_state_in=embedded_assistant_pb2.DialogStateIn(
+                language_code=self.language_code,
+            ),
+            device_config=embedded_assistant_pb2.DeviceConfig(
+                device_id=self.device_id,
+                device_model_id=self.device_model_id,
+            )
+        )
+        if self.display:
+            self.config.screen_out_config.screen_mode = PLAYING
+
+        # Audio responses are played back on a dedicated thread so that
+        # a blocking sound device write does not stall the reception of
+        # further AssistResponse messages. The bounded queue applies
+        # backpressure to the gRPC response loop.
+        self.playback_queue = queue.Queue(maxsize=PLAYBACK_QUEUE_SIZE)
+        self.playback_thread = threading.Thread(target=self.playback_worker)
+        self.playback_thread.daemon = True
+        self.playback_thread.start()
+
     def __enter__(self):
         return self
 
     def __exit__(self, etype, e, traceback):
+        self.playback_queue.put(None)
         if e:
             return False
+        self.playback_thread.join()
         self.conversation_stream.close()
 
+    def playback_worker(self):
+        """Write queued audio responses to the conversation stream.
+
+        Exits when None is dequeued.
+        """
+        while True:
+            buf = self.playback_queue.get()
+            try:
+                if buf is None:
+                    return
+                self.conversation_stream.write(buf)
+            except Exception:
+                logger.exception('Error during audio playback')
+            finally:
+                self.playback_queue.task_done()
+
     def is_grpc_error_unavailable(e):
+        import grpc
         is_grpc_error = isinstance(e, grpc.RpcError)
         if is_grpc_error and (e.code() == grpc.StatusCode.UNAVAILABLE):
             logger.error('grpc unavailable error: %s', e)
@@ -153,17 +266,23 @@ class SampleAssistant(object):
         self.conversation_stream.start_recording()
         logger.info('Recording audio request.')
 
+        # Skip copying protos for logging unless debug logging is on.
+        log_debug = logger.isEnabledFor(logging.DEBUG)
+
         def iter_log_assist_requests():
             for c in self.gen_assist_requests():
-                assistant_helpers.log_assist_request_without_audio(c)
+                if log_debug:
+                    assistant_helpers.log_assist_request_without_audio(c)
                 yield c
             logger.debug('Reached end of AssistRequest iteration.')
 
+        playback_started = False
         # This generator yields AssistResponse proto messages
         # received from the gRPC Google Assistant API.
         for resp in self.assistant.Assist(iter_log_assist_requests(),
                                           self.deadline):
-            assistant_helpers.log_assist_response_without_audio(resp)
+            if log_debug:
+                assistant_helpers.log_assist_response_without_audio(resp)
             if resp.event_type == END_OF_UTTERANCE:
                 logger.info('End of audio request detected.')
                 logger.info('Stopping recording.')
@@ -173,11 +292,13 @@ class SampleAssistant(object):
                              ' '.join(r.transcript
                                       for r in resp.speech_results))
             if len(resp.audio_out.audio_data) > 0:
-                if not self.conversation_stream.playing:
+                if not playback_started:
                     self.conversation_stream.stop_recording()
                     self.conversation_stream.start_playback()
+                    playback_started = True
                     logger.info('Playing assistant response.')
-                self.conversation_stream.write(resp.audio_out.audio_data)
+                self.playback_queue.put(
+                    memoryview(resp.audio_out.audio_data))
             if resp.dialog_state_out.conversation_state:
                 conversation_state = resp.dialog_state_out.conversation_state
                 logger.debug('Updating conversation state.')
@@ -192,7 +313,7 @@ class SampleAssistant(object):
             elif resp.dialog_state_out.microphone_mode == CLOSE_MICROPHONE:
                 continue_conversation = False
             if resp.device_action.device_request_json:
-                device_request = json.loads(
+                device_request = json_loads(
                     resp.device_action.device_request_json
                 )
                 fs = self.device_handler(device_request)
@@ -205,7 +326,15 @@ class SampleAssistant(object):
         if len(device_actions_futures):
             logger.info('Waiting for device executions to complete.')
             concurrent.futures.wait(device_actions_futures)
-
+            # Handlers may return futures for work they scheduled
+            # in the background, such as speech synthesis.
+            scheduled_futures = []
+            for f in device_actions_futures:
+                if not f.exception() and f.result():
+                    scheduled_futures.extend(f.result())
+            concurrent.futures.wait(scheduled_futures)
+
+        self.playback_queue.join()
         logger.info('Finished playing assistant response.')
         self.conversation_stream.stop_playback()
         return continue_conversation
@@ -213,36 +342,33 @@ class SampleAssistant(object):
     def gen_assist_requests(self):
         """Yields: AssistRequest messages to send to the API."""
 
-        config = embedded_assistant_pb2.AssistConfig(
-            audio_in_config=embedded_assistant_pb2.AudioInConfig(
-                encoding='LINEAR16',
-                sample_rate_hertz=self.conversation_stream.sample_rate,
-            ),
-            audio_out_config=embedded_assistant_pb2.AudioOutConfig(
-                encoding='LINEAR16',
-                sample_rate_hertz=self.conversation_stream.sample_rate,
-                volume_percentage=self.conversation_stream.volume_percentage,
-            ),
-            dialog_state_in=embedded_assistant_pb2.DialogStateIn(
-                language_code=self.language_code,
-                conversation_state=self.conversation_state,
-                is_new_conversation=self.is_new_conversation,
-            ),
-            device_config=embedded_assistant_pb2.DeviceConfig(
-                device_id=self.device_id,
-                device_model_id=self.device_model_id,
-            )
-        )
-        if self.display:
-            config.screen_out_config.screen_mode = PLAYING
+        # Only the conversation state and volume change between turns.
+        config = self.config
+        config.dialog_state_in.conversation_state = (
+            self.conversation_state or b'')
+        config.dialog_state_in.is_new_conversation = self.is_new_conversation
+        config.audio_out_config.volume_percentage = (
+            self.conversation_stream.volume_percentage)
         # Continue current conversation with later requests.
         self.is_new_conversation = False
         # The first AssistRequest must contain the AssistConfig
         # and no audio data.
         yield embedded_assistant_pb2.AssistRequest(config=config)
+        # Subsequent requests need audio data, but not config.
+        # gRPC serializes each request before pulling the next one,
+        # so a single message is reused for every audio chunk.
+        req = embedded_assistant_pb2.AssistRequest()
+        batch_size = self.conversation_stream.iter_size * AUDIO_BATCH_CHUNKS
+        buf = bytearray()
         for data in self.conversation_stream:
-            # Subsequent requests need audio data, but not config.
-            yield embedded_assistant_pb2.AssistRequest(audio_in=data)
+            buf.extend(data)
+            if len(buf) >= batch_size:
+                req.audio_in = bytes(buf)
+                del buf[:]
+                yield req
+        if buf:
+            req.audio_in = bytes(buf)
+            yield req
 
 
 @click.command()
@@ -250,10 +376,10 @@ class SampleAssistant(object):
               metavar='<api endpoint>', show_default=True,
               help='Address of Google Assistant API service.')
 @click.option('--credentials',
-              metavar='<credentials>', show_default=True,
-              default=os.path.join(click.get_app_dir('google-oauthlib-tool'),
-                                   'credentials.json'),
-              help='Path to read OAuth2 credentials.')
+              metavar='<credentials>',
+              help=('Path to read OAuth2 credentials, defaults to '
+                    'credentials.json in the google-oauthlib-tool '
+                    'app directory.'))
 @click.option('--project-id',
               metavar='<project id>',
               help=('Google Developer Project ID used for registration '
@@ -268,12 +394,11 @@ class SampleAssistant(object):
                      'if not specified, it is read from --device-config, '
                      'if no device_config found: a new device is registered '
                      'using a unique id and a new device config is saved')))
-@click.option('--device-config', show_default=True,
+@click.option('--device-config',
               metavar='<device config>',
-              default=os.path.join(
-                  click.get_app_dir('googlesamples-assistant'),
-                  'device_config.json'),
-              help='Path to save and restore the device configuration')
+              help=('Path to save and restore the device configuration, '
+                    'defaults to device_config.json in the '
+                    'googlesamples-assistant app directory.'))
 @click.option('--lang', show_default=True,
               metavar='<language code>',
               default='en-US',
@@ -343,6 +468,17 @@ def main(api_endpoint, credentials, project_id,
     # logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO)
     logger.setLevel(logging.DEBUG if verbose else logging.INFO)
 
+    # Default paths are resolved here rather than when defining options.
+    credentials = credentials or os.path.join(
+        click.get_app_dir('google-oauthlib-tool'), 'credentials.json')
+    device_config = device_config or os.path.join(
+        click.get_app_dir('googlesamples-assistant'), 'device_config.json')
+
+    import grpc
+    import google.auth.transport.grpc
+    import google.auth.transport.requests
+    import google.oauth2.credentials
+
     # Load OAuth 2.0 credentials.
     try:
         with open(credentials, 'r') as f:
@@ -358,11 +494,29 @@ def main(api_endpoint, credentials, project_id,
 
     # Create an authorized gRPC channel.
     grpc_channel = google.auth.transport.grpc.secure_authorized_channel(
-        credentials, http_request, api_endpoint)
+        credentials, http_request, api_endpoint,
+        options=GRPC_CHANNEL_OPTIONS)
     logger.info('Connecting to %s', api_endpoint)
 
+    # The same channel is reused by every conversation; watch it so that
+    # connection problems between hotword triggers are visible.
+    def log_channel_state(state):
+        if state == grpc.ChannelConnectivity.TRANSIENT_FAILURE:
+            logger.warning('gRPC channel state: %s', state)
+        else:
+            logger.debug('gRPC channel state: %s', state)
+    grpc_channel.subscribe(log_channel_state, try_to_connect=True)
+
     # Configure audio source and sink.
+    # A single sound device is shared when used for both.
     audio_device = None
+    if not (input_audio_file and output_audio_file):
+        audio_device = audio_helpers.SoundDeviceStream(
+            sample_rate=audio_sample_rate,
+            sample_width=audio_sample_width,
+            block_size=audio_block_size,
+            flush_size=audio_flush_size
+        )
     if input_audio_file:
         audio_source = audio_helpers.WaveSource(
             open(input_audio_file, 'rb'),
@@ -370,14 +524,7 @@ def main(api_endpoint, credentials, project_id,
             sample_width=audio_sample_width
         )
     else:
-        audio_source = audio_device = (
-            audio_device or audio_helpers.SoundDeviceStream(
-                sample_rate=audio_sample_rate,
-                sample_width=audio_sample_width,
-                block_size=audio_block_size,
-                flush_size=audio_flush_size
-            )
-        )
+        audio_source = audio_device
     if output_audio_file:
         audio_sink = audio_helpers.WaveSink(
             open(output_audio_file, 'wb'),
@@ -385,14 +532,7 @@ def main(api_endpoint, credentials, project_id,
             sample_width=audio_sample_width
         )
     else:
-        audio_sink = audio_device = (
-            audio_device or audio_helpers.SoundDeviceStream(
-                sample_rate=audio_sample_rate,
-                sample_width=audio_sample_width,
-                block_size=audio_block_size,
-                flush_size=audio_flush_size
-            )
-        )
+        audio_sink = audio_device
     # Create conversation stream with the given audio source and sink.
     conversation_stream = audio_helpers.ConversationStream(
         source=audio_source,
@@ -411,7 +551,7 @@ def main(api_endpoint, credentials, project_id,
                              device_model_id,
                              device_id)
         except Exception as e:
-            logger.warning('Device config not found: %s' % e)
+            logger.warning('Device config not found: %s', e)
             logger.info('Registering device')
             if not device_model_id:
                 logger.error('Option --device-model-id required '
@@ -445,15 +585,43 @@ def main(api_endpoint, credentials, project_id,
 
     device_handler = device_helpers.DeviceRequestHandler(device_id)
 
+    # Speech synthesis runs in the background so that device handlers
+    # return without waiting for the Text-To-Speech round-trip.
+    # A single worker keeps spoken answers from overlapping.
+    tts_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def log_say_error(future):
+        e = future.exception()
+        if e:
+            logger.error('Error during speech synthesis', exc_info=e)
+
+    def say(text):
+        future = tts_executor.submit(synthesize_text.synthesize_text, text)
+        future.add_done_callback(log_say_error)
+        return [future]
+
+    # Commands launched by device handlers are waited on here, so that
+    # a failure is logged without holding up the handler.
+    command_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def wait_command(proc):
+        output = proc.communicate()[0].decode('utf-8', 'replace').strip()
+        if proc.returncode != 0:
+            logger.error('Command %s failed with exit status %d: %s',
+                         proc.args, proc.returncode, output)
+        elif output:
+            # The bin/ scripts report failures on stdout and exit with 0.
+            logger.info('Command %s: %s', proc.args, output)
+
     @device_handler.command('action.devices.commands.BrightnessAbsolute')
     def brightness_absolute(brightness):
         # ex. 明るさを65%にして
-        logger.info('Setting the brightness to %i' % brightness)
+        logger.info('Setting the brightness to %i', brightness)
 
     @device_handler.command('action.devices.commands.ColorAbsolute')
     def color_absolute(color):
         # ex. "明かりの色を青くして", "明かりを柔らかい白にして"
-        logger.info('Setting the color to %s' % color)
+        logger.info('Setting the color to %s', color)
 
     @device_handler.command('action.devices.commands.Dock')
     def dock():
@@ -463,12 +631,19 @@ def main(api_endpoint, credentials, project_id,
     @device_handler.command('action.devices.commands.OnOff')
     def onoff(on):
         # ex. "つけて","点灯して","消して","消灯して"
+        # The IR command is launched without waiting for it to finish;
+        # its output and exit status are logged in the background.
         if on:
-            subprocess.check_call('./bin/tentou')
+            proc = subprocess.Popen(['./bin/tentou'],
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT)
             logger.info('Turning device on')
         else:
-            subprocess.check_call('./bin/shoutou')
+            proc = subprocess.Popen(['./bin/shoutou'],
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT)
             logger.info('Turning device off')
+        command_executor.submit(wait_command, proc)
 
     @device_handler.command('action.devices.commands.StartStop')
     def startstop(start):
@@ -488,7 +663,7 @@ def main(api_endpoint, credentials, project_id,
 
     @device_handler.command('action.devices.commands.ThermostatTemperatureSetpoint')
     def thermostat(thermostatTemperatureSetpoint):
-        logger.info('Setting thermostat to %i' % thermostatTemperatureSetpoint)
+        logger.info('Setting thermostat to %i', thermostatTemperatureSetpoint)
 
     @device_handler.command('io.github.naohirotamura.commands.ReportLightSensor')
     def light_sensor():
@@ -496,95 +671,94 @@ def main(api_endpoint, credentials, project_id,
             ratio = lightsensor.read_lightsensor_adc_ratio()
         else:
             ratio = 0
-        logger.info('Reporting light sensor AD converter ratio: %.2f percent'
-              % ratio)
-        synthesize_text.synthesize_text(
+        logger.info('Reporting light sensor AD converter ratio: %.2f percent',
+                    ratio)
+        return say(
             'ライトセンサー AD コンバーター比は %.2f パーセントです' % ratio)
 
     @device_handler.command('io.github.naohirotamura.commands.ReportHumidity')
     def humidity():
-        for i in range(20):
+        deadline = time.monotonic() + DHT11_READ_TIMEOUT
+        delay = DHT11_RETRY_DELAY
+        while True:
             if GPIO_FLAG:
                 result = dht11.read_dht11_dat()
             else:
                 result = [0, 0]
-            if result:
+            if result or time.monotonic() + delay > deadline:
                 break
-            else:
-                logger.info("%s: Data not good, skip" % i)
-                time.sleep(0.5)
+            logger.info("Data not good, retry in %.2fs", delay)
+            time.sleep(delay)
+            delay = min(delay * 2, DHT11_RETRY_MAX_DELAY)
         if result:
             humidity, temperature = result
-            logger.info("Reporting humidity: %s %%,  Temperature: %s C"
-                        % (humidity, temperature))
-            synthesize_text.synthesize_text(
+            logger.info("Reporting humidity: %s %%,  Temperature: %s C",
+                        humidity, temperature)
+            return say(
                 '湿度は %s パーセントです' % humidity)
         else:
             logger.info('Reporting humidity: timeout')
-            synthesize_text.synthesize_text(
+            return say(
                 '湿度の取得はタイムアウトしました')
 
     @device_handler.command('io.github.naohirotamura.commands.ReportAltitude')
     def altitude():
         if GPIO_FLAG:
-            altitude = bmp.read_altitude()
+            altitude = read_bmp180('altitude')
         else:
             altitude = 0
-        logger.info('Reporting altitude: %.2f meter' % altitude)
-        synthesize_text.synthesize_text(
+        logger.info('Reporting altitude: %.2f meter', altitude)
+        return say(
             '標高は %.2f メートルです' % altitude)
 
     @device_handler.command('io.github.naohirotamura.commands.ReportTemperature')
     def temperature():
         if GPIO_FLAG:
-            temperature = bmp.read_temperature()
+            temperature = read_bmp180('temperature')
         else:
             temperature = 0
-        logger.info('Reporting room temperature: %.2f C' % temperature)
-        synthesize_text.synthesize_text(
+        logger.info('Reporting room temperature: %.2f C', temperature)
+        return say(
             '部屋の気温は %.2f 度です' % temperature)
 
     @device_handler.command('io.github.naohirotamura.commands.ReportPressure')
     def pressure():
         if GPIO_FLAG:
-            pressure = bmp.read_pressure() / 100.0
+            pressure = read_bmp180('pressure') / 100.0
         else:
             pressure = 0
-        logger.info('Reporting pressure: %.2f hPa' % pressure)
-        synthesize_text.synthesize_text(
+        logger.info('Reporting pressure: %.2f hPa', pressure)
+        return say(
             '部屋の気圧は %.2f ヘクトパスカルです' % pressure)
 
     @device_handler.command('com.fujitsu.commands.CommitCountReport')
     def commit_count_report(repository, start, end):
-        OWNER = {'faasshell': 'naohirotamura',
-                 'buildah': 'containers',
-                 'kubernetes': 'kubernetes'}
-
-        date_pattern = re.compile('(\d{4})年(\d{1,2})月(\d{1,2})日')
-
-        logger.info('Querying ' + repository + ' from ' + start + ' to ' + end)
+        logger.info('Querying %s from %s to %s', repository, start, end)
+        # Defaults to the last 30 days.
         if start == '':
-            start_iso = date.today().strftime("%Y-%m-%d") + "T00:00:00+00:00"
+            start_iso = ((date.today() - timedelta(days=30)).isoformat()
+                         + DATE_SUFFIX)
         else:
-            y1,m1,d1 = date_pattern.search(start).groups()
-            start_iso = date(int(y1),int(m1),int(d1)).strftime("%Y-%m-%d") + "T00:00:00+00:00"
+            y1, m1, d1 = DATE_PATTERN.search(start).groups()
+            start_iso = '%s-%02d-%02d%s' % (y1, int(m1), int(d1), DATE_SUFFIX)
         if end == '':
-            end_iso = (date.today() - timedelta(days=30)).strftime("%Y-%m-%d") + "T00:00:00+00:00"
+            end_iso = date.today().isoformat() + DATE_SUFFIX
         else:
-            y2,m2,d2 = date_pattern.search(end).groups()
-            end_iso = date(int(y2),int(m2),int(d2)).strftime("%Y-%m-%d") + "T00:00:00+00:00"
+            y2, m2, d2 = DATE_PATTERN.search(end).groups()
+            end_iso = '%s-%02d-%02d%s' % (y2, int(m2), int(d2), DATE_SUFFIX)
 
         print('owner:', OWNER[repository], 'start:', start_iso, 'end:', end_iso)
         result = faasshell.commit_count_report(OWNER[repository], repository,
                                                start_iso, end_iso)
         if 'error' in result.keys():
-            logger.info('Commit count report returned error', result['error'])
-            synthesize_text.synthesize_text(
+            logger.info('Commit count report returned error: %s',
+                        result['error'])
+            return say(
                 'コミットカウントレポートはエラーになりました')
         else:
             report = result['output']['github']['output']['values'][0]
-            logger.info('Commit count report returned ', report)
-            synthesize_text.synthesize_text(
+            logger.info('Commit count report returned %s', report)
+            return say(
                 'コミットカウントレポートによると、リポジトリ'
                 + report[2] + ' へ' + report[0] + 'は、コミット数'
                 + str(report[5]) + ' 件の貢献をしました')
@@ -606,19 +780,40 @@ def main(api_endpoint, credentials, project_id,
         # When the once flag is set, don't wait for a trigger. Otherwise, wait.
         def detected_callback():
             logger.info("hotword detected")
-            snowboywave.play_audio_file(snowboywave.DETECT_DING)
-            if GPIO_FLAG:
-                LED23.on()
-            assistant.assist()
-            snowboywave.play_audio_file(snowboywave.DETECT_DONG)
-            if GPIO_FLAG:
-                LED23.off()
+            # Pause hotword capture so that only the conversation stream
+            # records from the microphone during the conversation.
+            detector.stream_in.stop_stream()
+            try:
+                # Reconnect an idle channel while the ding is playing.
+                channel_ready = grpc.channel_ready_future(grpc_channel)
+                snowboywave.play_audio_file(snowboywave.DETECT_DING)
+                if GPIO_FLAG:
+                    LED23.on()
+                try:
+                    channel_ready.result(timeout=5)
+                except grpc.FutureTimeoutError:
+                    logger.warning('gRPC channel not ready after 5s')
+                    # Unsubscribes the future from the channel.
+                    channel_ready.cancel()
+                assistant.assist()
+                snowboywave.play_audio_file(snowboywave.DETECT_DONG)
+                if GPIO_FLAG:
+                    LED23.off()
+            finally:
+                detector.stream_in.start_stream()
 
         if once:
             assistant.assist()
         else:
-            detector = snowboydecoder.HotwordDetector("resources/snowboy.umdl", sensitivity=0.9, audio_gain=1)
-            detector.start(detected_callback)
+            detector = snowboydecoder.HotwordDetector(
+                "resources/snowboy.umdl", sensitivity=0.9, audio_gain=1)
+            try:
+                detector.start(detected_callback)
+            finally:
+                # Release the PortAudio input stream used for detection,
+                # unless start() failed before opening it.
+                if hasattr(detector, 'stream_in'):
+                    detector.terminate()
 
         """
         wait_for_user_trigger = not once
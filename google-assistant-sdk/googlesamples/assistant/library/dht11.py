@@ -32,9 +32,16 @@ def read_dht11_dat():
     unchanged_count = 0
     last = -1
     data = []
+    # Local names keep the sampling loop as short as possible, since
+    # faster sampling gives a better resolution of the pulse lengths.
+    # The loop does not keep the GIL: another running Python thread can
+    # take it every sys.getswitchinterval() seconds, so callers should
+    # not run other sensor reads meanwhile.
+    gpio_input = GPIO.input
+    append = data.append
     while True:
-        current = GPIO.input(DHTPIN)
-        data.append(current)
+        current = gpio_input(DHTPIN)
+        append(current)
         if last != current:
             unchanged_count = 0
             last = current
@@ -1,12 +1,28 @@
 #!/usr/bin/env python
 
-import json
+"""Client for the faasshell commit count report state machine.
+
+Shared by the library and gRPC samples: grpc/faasshell.py is a symlink
+to this file.
+"""
+
 import requests
+from requests.adapters import HTTPAdapter
+
+FAASSHELL_APIHOST = 'https://protected-depths-49487.herokuapp.com'
+
+# Reuse connections (and their TLS sessions) across calls.
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+_AUTH = requests.auth.HTTPBasicAuth(
+    'ec29e90c-188d-11e8-bb72-00163ec1cd01',
+    '0b82fe63b6bd450519ade02c3cb8f77ee581f25a810db28f3910e6cdd9d041bf')
+
 
 def commit_count_report(owner, name, since, until):
-    faasshell_apihost = 'https://protected-depths-49487.herokuapp.com'
-    url = faasshell_apihost + '/statemachine/commit_count_report.json?blocking=true'
-    header = {'Content-type': 'application/json'}
+    url = (FAASSHELL_APIHOST
+           + '/statemachine/commit_count_report.json?blocking=true')
     payload = {
         'input': {
             'github': {
@@ -21,11 +37,7 @@ def commit_count_report(owner, name, since, until):
             }
         }
     }
-    auth = requests.auth.HTTPBasicAuth(
-        'ec29e90c-188d-11e8-bb72-00163ec1cd01',
-        '0b82fe63b6bd450519ade02c3cb8f77ee581f25a810db28f3910e6cdd9d041bf')
-    reply = requests.post(url, data=json.dumps(payload), headers=header,
-                          verify=False, timeout=30, auth=auth).json()
+    reply = _SESSION.post(url, json=payload, timeout=30, auth=_AUTH).json()
 
     return reply
 
@@ -16,14 +16,22 @@
 
 
 from __future__ import print_function
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
 import argparse
+import atexit
+import concurrent.futures
+import functools
+import io
 import json
 import os.path
 import pathlib2 as pathlib
 import re
+import shutil
 import subprocess
+import sys
+import threading
 import time
+import types
 
 import google.oauth2.credentials
 
@@ -38,16 +46,12 @@ import synthesize_text
 import faasshell
 
 try:
-    from BMP180 import BMP180
-    import dht11
-    from gpiozero import LED
-    import lightsensor
-    GPIO_FLAG = True
-except:
-    GPIO_FLAG = False
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
-import faulthandler
-faulthandler.enable()
+    def json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
 
 try:
     FileNotFoundError
@@ -63,10 +67,448 @@ WARNING_NOT_REGISTERED = """
     https://developers.google.com/assistant/sdk/guides/library/python/embed/register-device
 """
 
-if GPIO_FLAG:
-    LED23 = LED(23)
-    bmp = BMP180()
-    lightsensor.setup()
+# Output of this sample. main() replaces it with a buffered writer that
+# is only flushed at the events below, instead of line by line.
+_out = sys.stdout
+FLUSH_EVENTS = (
+    EventType.ON_CONVERSATION_TURN_FINISHED,
+    EventType.ON_DEVICE_ACTION,
+    EventType.ON_ASSISTANT_ERROR,
+)
+
+# Japanese date such as '2018年6月21日' spoken in CommitCountReport.
+DATE_PATTERN = re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日')
+
+# GitHub (owner, name) of the repositories known to CommitCountReport.
+OWNER_REPO = {'faasshell': ('naohirotamura', 'faasshell'),
+              'buildah': ('containers', 'buildah'),
+              'kubernetes': ('kubernetes', 'kubernetes')}
+
+# IR codes sent to the light by the USB IR transmitter, as used by the
+# bin/tentou and bin/shoutou scripts.
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin')
+with open(os.path.join(BIN_DIR, 'tentou.txt')) as f:
+    IR_LIGHT_ON = f.read().strip()
+with open(os.path.join(BIN_DIR, 'shoutou.txt')) as f:
+    IR_LIGHT_OFF = f.read().strip()
+SUDO = shutil.which('sudo') or 'sudo'
+
+# Fixed answers synthesized in the background at startup so that they are
+# already cached when first needed.
+PREWARM_TEXTS = (
+    '湿度の取得はタイムアウトしました',
+    'コミットカウントレポートはエラーになりました',
+)
+
+# CPUs dedicated to the event loop and to the sensor threads on a
+# multi-core Pi, so that they do not migrate between cores.
+EVENT_LOOP_CPU = 2
+SENSOR_CPU = 3
+EVENT_LOOP_NICENESS = -5
+
+# CPUs available to the process, recorded before any thread is pinned,
+# since threads inherit the affinity of the thread that starts them.
+try:
+    _AVAILABLE_CPUS = frozenset(os.sched_getaffinity(0))
+except AttributeError:
+    _AVAILABLE_CPUS = frozenset()
+
+
+def _pin_current_thread(cpu):
+    """Restricts the calling thread to the given CPU, if it is available."""
+    if cpu not in _AVAILABLE_CPUS:
+        print('Not pinning thread to unavailable CPU %d' % cpu, file=_out)
+        return
+    try:
+        os.sched_setaffinity(0, {cpu})
+    except OSError as e:
+        print('Failed to pin thread to CPU %d: %s' % (cpu, e), file=_out)
+
+
+# Slow sensor reads run on a worker thread so that they do not hold up
+# the delivery of Assistant events.
+_SENSOR_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=1, initializer=_pin_current_thread, initargs=(SENSOR_CPU,))
+# Commit count reports call a remote service and are answered once it
+# replies, without blocking the event loop in the meantime.
+_REPORT_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+# DHT11 reads are retried until valid data is read or the timeout in
+# seconds would be exceeded by the next retry.
+DHT11_READ_TIMEOUT = 10
+DHT11_RETRY_DELAY = 0.5
+
+
+@functools.lru_cache(None)
+def _load_gpio():
+    """Imports the sensor modules and sets up the devices on first use.
+
+    Returns:
+        A namespace with the LED, the sensors and their sampler, or None
+        if the GPIO modules are not available or the devices could not be
+        set up.
+    """
+    try:
+        from BMP180 import BMP180
+        import dht11
+        from gpiozero import LED
+        import lightsensor
+    except (ImportError, RuntimeError):
+        # RPi.GPIO raises RuntimeError when not running on a Raspberry Pi.
+        return None
+    # A failed setup is remembered as no GPIO, instead of being retried
+    # and raised from the event loop on every call.
+    try:
+        lightsensor.setup()
+        gpio = types.SimpleNamespace(
+            led23=LED(23), bmp=BMP180(), dht11=dht11, lightsensor=lightsensor,
+            read_lock=threading.Lock())
+    except Exception as e:
+        print('Failed to set up GPIO devices: %s' % e, file=_out)
+        return None
+    gpio.sampler = SensorSampler(gpio)
+    gpio.sampler.sample()
+    gpio.sampler.start()
+    return gpio
+
+
+def _read_dht11_with_retries(gpio):
+    """Reads the DHT11 sensor, retrying until it returns valid data.
+
+    Retries stop once the next one would not finish within
+    DHT11_READ_TIMEOUT, so a failing sensor does not hold the worker.
+
+    The read runs with real-time scheduling when permitted, since
+    scheduling jitter during the bit-banged transfer is what makes
+    DHT11 reads fail.
+
+    Args:
+        gpio: The namespace returned by _load_gpio().
+
+    Returns:
+        (humidity, temperature), or False if no read succeeded.
+    """
+    if gpio is None:
+        return [0, 0]
+    try:
+        policy = os.sched_getscheduler(0)
+        param = os.sched_getparam(0)
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(
+            os.sched_get_priority_max(os.SCHED_FIFO)))
+    except (AttributeError, OSError):
+        policy = None
+    try:
+        deadline = time.monotonic() + DHT11_READ_TIMEOUT
+        i = 0
+        while True:
+            started = time.monotonic()
+            # Keeps the sampler from competing for the GIL mid-transfer.
+            with gpio.read_lock:
+                result = gpio.dht11.read_dht11_dat()
+            if result:
+                return result
+            print("%s: Data not good, skip" % i, file=_out)
+            # Assume the next read takes as long as this one did.
+            now = time.monotonic()
+            if now + DHT11_RETRY_DELAY + (now - started) > deadline:
+                return False
+            time.sleep(DHT11_RETRY_DELAY)
+            i += 1
+    finally:
+        if policy is not None:
+            os.sched_setscheduler(0, policy, param)
+
+
+LIGHT_SAMPLE_INTERVAL = 0.2
+BMP180_SAMPLE_INTERVAL = 1.0
+
+
+class SensorSampler(threading.Thread):
+    """Samples the light sensor and the BMP180 in the background.
+
+    Device actions report the latest samples instead of reading the
+    sensors from the event loop. Samples are taken under the read lock
+    of the GPIO namespace, so sampling pauses while the DHT11 is read.
+    """
+
+    def __init__(self, gpio):
+        super(SensorSampler, self).__init__()
+        self.daemon = True
+        self._gpio = gpio
+        self._next_bmp180_sample = 0
+        self._lock = threading.Lock()
+        self._samples = {
+            'light': 0,
+            'altitude': 0,
+            'temperature': 0,
+            'pressure': 0,
+        }
+
+    def get(self, name):
+        """Returns the latest sample of the given sensor value."""
+        with self._lock:
+            return self._samples[name]
+
+    def sample(self):
+        """Reads the sensors that are due and stores their values."""
+        gpio = self._gpio
+        try:
+            with gpio.read_lock:
+                samples = {
+                    'light': gpio.lightsensor.read_lightsensor_adc_ratio()}
+                now = time.monotonic()
+                if now >= self._next_bmp180_sample:
+                    pressure = float(gpio.bmp.read_pressure())
+                    samples['temperature'] = gpio.bmp.read_temperature()
+                    samples['pressure'] = pressure / 100.0
+                    # Same as BMP180.read_altitude(), without reading the
+                    # pressure and temperature again.
+                    samples['altitude'] = 44330.0 * (
+                        1.0 - pow(pressure / 101325.0, (1.0/5.255)))
+                    self._next_bmp180_sample = (
+                        now + BMP180_SAMPLE_INTERVAL)
+            with self._lock:
+                self._samples.update(samples)
+        except Exception as e:
+            print('Sensor sampling failed: %s' % e, file=_out)
+
+    def run(self):
+        _pin_current_thread(SENSOR_CPU)
+        while True:
+            time.sleep(LIGHT_SAMPLE_INTERVAL)
+            self.sample()
+
+
+def _open_buffered_stdout():
+    """Returns a buffered writer on stdout's file descriptor.
+
+    Returns stdout itself if it has no file descriptor, e.g. when it has
+    been replaced by a StringIO.
+    """
+    try:
+        fd = sys.stdout.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return sys.stdout
+    sys.stdout.flush()
+    out = io.open(fd, 'w', buffering=8192, closefd=False,
+                  encoding=sys.stdout.encoding)
+    atexit.register(out.flush)
+    return out
+
+
+def prewarm_synthesized_texts():
+    """Populates the speech synthesis cache with PREWARM_TEXTS."""
+    for text in PREWARM_TEXTS:
+        try:
+            synthesize_text.synthesize_audio(text)
+        except Exception as e:
+            print('Failed to synthesize %r: %s' % (text, e), file=_out)
+
+
+def _send_ir(code):
+    # Runs the IR command directly rather than through the bin/ scripts,
+    # which would fork bash and a cat subshell first. subprocess only
+    # uses posix_spawn for an executable given with its directory and
+    # close_fds=False; fds Python opens are not inheritable by default.
+    subprocess.check_call([SUDO, 'bto_advanced_USBIR_cmd', '-d', code],
+                          close_fds=False)
+
+
+def _onoff(params, assistant):
+    try:
+        if params['on']:
+            _send_ir(IR_LIGHT_ON)
+            print('Turning the ligtht on.', file=_out)
+        else:
+            _send_ir(IR_LIGHT_OFF)
+            print('Turning the light off.', file=_out)
+    except:
+        print("subprocess.check_call() failed", file=_out)
+
+
+def _report_light_sensor(params, assistant):
+    gpio = _load_gpio()
+    if gpio:
+        ratio = gpio.sampler.get('light')
+    else:
+        ratio = 0
+    print('Reporting light sensor AD converter ratio: %.2f percent'
+          % ratio, file=_out)
+    synthesize_text.synthesize_text(
+        'ライトセンサー AD コンバーター比は %.2f パーセントです' % ratio)
+
+
+def _report_humidity(params, assistant):
+    future = _SENSOR_EXECUTOR.submit(_read_dht11_with_retries, _load_gpio())
+    future.add_done_callback(_speak_humidity)
+
+
+def _speak_humidity(future):
+    """Speaks the result of a DHT11 read."""
+    try:
+        result = future.result()
+    except Exception as e:
+        print('Reading humidity failed:', e, file=_out)
+        result = False
+    if result:
+        humidity, temperature = result
+        print("Reporting humidity: %s %%,  Temperature: %s C"
+              % (humidity, temperature), file=_out)
+        synthesize_text.synthesize_text(
+            '湿度は %s パーセントです' % humidity)
+    else:
+        print('Reporting humidity: timeout', file=_out)
+        synthesize_text.synthesize_text(
+            '湿度の取得はタイムアウトしました')
+    _out.flush()
+
+
+def _report_altitude(params, assistant):
+    gpio = _load_gpio()
+    if gpio:
+        altitude = gpio.sampler.get('altitude')
+    else:
+        altitude = 0
+    print('Reporting altitude: %.2f meter' % altitude, file=_out)
+    synthesize_text.synthesize_text(
+        '標高は %.2f メートルです' % altitude)
+
+
+def _report_temperature(params, assistant):
+    gpio = _load_gpio()
+    if gpio:
+        temperature = gpio.sampler.get('temperature')
+    else:
+        temperature = 0
+    print('Reporting room temperature: %.2f C' % temperature, file=_out)
+    synthesize_text.synthesize_text(
+        '部屋の気温は %.2f 度です' % temperature)
+
+
+def _report_pressure(params, assistant):
+    gpio = _load_gpio()
+    if gpio:
+        pressure = gpio.sampler.get('pressure')
+    else:
+        pressure = 0
+    print('Reporting pressure: %.2f hPa' % pressure, file=_out)
+    synthesize_text.synthesize_text(
+        '部屋の気圧は %.2f ヘクトパスカルです' % pressure)
+
+
+def _midnight_utc_iso(d):
+    """Returns the ISO 8601 timestamp of midnight UTC on the given date."""
+    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc).isoformat()
+
+
+def _parse_jp_date(s, default):
+    """Returns the date spoken as '2018年6月21日' in s.
+
+    Returns default if s is empty.
+    """
+    if not s:
+        return default
+    y, m, d = DATE_PATTERN.search(s).groups()
+    return date(int(y), int(m), int(d))
+
+
+def _commit_count_report(params, assistant):
+    print('Querying', params['repository'], 'from', params['start'],
+          'to', params['end'], file=_out)
+    owner_repo = OWNER_REPO.get(params['repository'])
+    if owner_repo is None:
+        print('Unknown repository', params['repository'], file=_out)
+        synthesize_text.synthesize_text(
+            'コミットカウントレポートはエラーになりました')
+        return
+    owner, repo = owner_repo
+    # Defaults to the last 30 days.
+    today = date.today()
+    start = _midnight_utc_iso(
+        _parse_jp_date(params['start'], today - timedelta(days=30)))
+    end = _midnight_utc_iso(_parse_jp_date(params['end'], today))
+
+    print('owner:', owner, 'start:', start, 'end:', end, file=_out)
+    future = _REPORT_EXECUTOR.submit(faasshell.commit_count_report,
+                                     owner, repo, start, end)
+    future.add_done_callback(_speak_commit_count_report)
+
+
+def _speak_commit_count_report(future):
+    """Speaks the result of a faasshell commit count report."""
+    try:
+        result = future.result()
+    except Exception as e:
+        result = {'error': e}
+    print('result:', result, file=_out)
+    if 'error' in result.keys():
+        print('Commit count report returned error', result['error'], file=_out)
+        synthesize_text.synthesize_text(
+            'コミットカウントレポートはエラーになりました')
+    else:
+        report = result['output']['github']['output']['values'][0]
+        print('Commit count report returned ', report, file=_out)
+        synthesize_text.synthesize_text(
+            'コミットカウントレポートによると、リポジトリ'
+            + report[2] + ' へ' + report[0] + 'は、コミット数'
+            + str(report[5]) + ' 件の貢献をしました')
+    _out.flush()
+
+
+# Device action handlers by command namespace and name, called with the
+# command params and the Assistant.
+COMMAND_PREFIXES = {
+    'action.devices.commands.': {
+        'OnOff': _onoff,
+    },
+    'io.github.naohirotamura.commands.': {
+        'ReportLightSensor': _report_light_sensor,
+        'ReportHumidity': _report_humidity,
+        'ReportAltitude': _report_altitude,
+        'ReportTemperature': _report_temperature,
+        'ReportPressure': _report_pressure,
+    },
+    'com.fujitsu.commands.': {
+        'CommitCountReport': _commit_count_report,
+    },
+}
+
+# Full command names are built once so that dispatching an action is a
+# single lookup, without stripping prefixes per action. They are interned
+# like literal names would be, so interned commands match by identity.
+COMMAND_HANDLERS = dict(
+    (sys.intern(prefix + name), handler)
+    for prefix, handlers in COMMAND_PREFIXES.items()
+    for name, handler in handlers.items())
+
+
+def _on_conversation_turn_finished(event, assistant):
+    if event.args and not event.args['with_follow_on_turn']:
+        snowboywave.play_audio_file(snowboywave.DETECT_DONG)
+        gpio = _load_gpio()
+        if gpio:
+            gpio.led23.off()
+        print(file=_out)
+
+
+def _on_device_action(event, assistant):
+    # The conversation is stopped once, before the first known command.
+    stopped = False
+    for command, params in event.actions:
+        print('Do command', command, 'with params', str(params), file=_out)
+        handler = COMMAND_HANDLERS.get(command)
+        if handler:
+            if not stopped:
+                assistant.stop_conversation()
+                stopped = True
+            handler(params, assistant)
+
+
+# Event handlers, called with the event and the Assistant after the event
+# has been printed.
+EVENT_HANDLERS = {
+    EventType.ON_CONVERSATION_TURN_FINISHED: _on_conversation_turn_finished,
+    EventType.ON_DEVICE_ACTION: _on_device_action,
+}
 
 
 def process_event(event, assistant):
@@ -80,126 +522,19 @@ def process_event(event, assistant):
     """
     if event.type == EventType.ON_CONVERSATION_TURN_STARTED:
         snowboywave.play_audio_file(snowboywave.DETECT_DING)
-        if GPIO_FLAG:
-            LED23.on()
-        print()
+        gpio = _load_gpio()
+        if gpio:
+            gpio.led23.on()
+        print(file=_out)
 
-    print(event)
+    print(event, file=_out)
 
-    if (event.type == EventType.ON_CONVERSATION_TURN_FINISHED and
-            event.args and not event.args['with_follow_on_turn']):
-        snowboywave.play_audio_file(snowboywave.DETECT_DONG)
-        if GPIO_FLAG:
-            LED23.off()
-        print()
-    if event.type == EventType.ON_DEVICE_ACTION:
-        assistant.stop_conversation()
-        for command, params in event.actions:
-            print('Do command', command, 'with params', str(params))
-            if command == "action.devices.commands.OnOff":
-                try:
-                    if params['on']:
-                        subprocess.check_call('./bin/tentou')
-                        print('Turning the ligtht on.')
-                    else:
-                        subprocess.check_call('./bin/shoutou')
-                        print('Turning the light off.')
-                except:
-                    print("subprocess.check_call() failed")
-
-            if command == "io.github.naohirotamura.commands.ReportLightSensor":
-                if GPIO_FLAG:
-                    ratio = lightsensor.read_lightsensor_adc_ratio()
-                else:
-                    ratio = 0
-                print('Reporting light sensor AD converter ratio: %.2f percent'
-                      % ratio)
-                synthesize_text.synthesize_text(
-                    'ライトセンサー AD コンバーター比は %.2f パーセントです' % ratio)
-
-            if command == "io.github.naohirotamura.commands.ReportHumidity":
-                for i in range(20):
-                    if GPIO_FLAG:
-                        result = dht11.read_dht11_dat()
-                    else:
-                        result = [0,0]
-                    if result:
-                        break
-                    else:
-                        print("%s: Data not good, skip" % i)
-                        time.sleep(0.5)
-                if result:
-                    humidity, temperature = result
-                    print("Reporting humidity: %s %%,  Temperature: %s C"
-                          % (humidity, temperature))
-                    synthesize_text.synthesize_text(
-                        '湿度は %s パーセントです' % humidity)
-                else:
-                    print('Reporting humidity: timeout')
-                    synthesize_text.synthesize_text(
-                        '湿度の取得はタイムアウトしました')
-
-            if command == "io.github.naohirotamura.commands.ReportAltitude":
-                if GPIO_FLAG:
-                    altitude = bmp.read_altitude()
-                else:
-                    altitude = 0
-                print('Reporting altitude: %.2f meter' % altitude)
-                synthesize_text.synthesize_text(
-                    '標高は %.2f メートルです' % altitude)
-
-            if command == "io.github.naohirotamura.commands.ReportTemperature":
-                if GPIO_FLAG:
-                    temperature = bmp.read_temperature()
-                else:
-                    temperature = 0
-                print('Reporting room temperature: %.2f C' % temperature)
-                synthesize_text.synthesize_text(
-                    '部屋の気温は %.2f 度です' % temperature)
-
-            if command == "io.github.naohirotamura.commands.ReportPressure":
-                if GPIO_FLAG:
-                    pressure = bmp.read_pressure() / 100.0
-                else:
-                    pressure = 0
-                print('Reporting pressure: %.2f hPa' % pressure)
-                synthesize_text.synthesize_text(
-                    '部屋の気圧は %.2f ヘクトパスカルです' % pressure)
-
-            if command == "com.fujitsu.commands.CommitCountReport":
-                OWNER = {'faasshell': 'naohirotamura',
-                         'buildah': 'containers',
-                         'kubernetes': 'kubernetes'}
-
-                date_pattern = re.compile('(\d{4})年(\d{1,2})月(\d{1,2})日')
-
-                print('Querying', params['repository'], 'from', params['start'], 'to', params['end'])
-                if params['start'] == '':
-                    start = date.today().strftime("%Y-%m-%d") + "T00:00:00+00:00"
-                else:
-                    y1,m1,d1 = date_pattern.search(params['start']).groups()
-                    start = date(int(y1),int(m1),int(d1)).strftime("%Y-%m-%d") + "T00:00:00+00:00"
-                if params['end'] == '':
-                    end = (date.today() - timedelta(days=30)).strftime("%Y-%m-%d") + "T00:00:00+00:00"
-                else:
-                    y2,m2,d2 = date_pattern.search(params['end']).groups()
-                    end = date(int(y2),int(m2),int(d2)).strftime("%Y-%m-%d") + "T00:00:00+00:00"
-
-                print('owner:', OWNER[params['repository']], 'start:', start, 'end:', end)
-                result = faasshell.commit_count_report(OWNER[params['repository']], params['repository'],
-                                                       start, end)
-                print('result:', result)
-                if 'error' in result.keys():
-                    print('Commit count report returned error', result['error'])
-                    synthesize_text.synthesize_text(
-                        'コミットカウントレポートはエラーになりました')
-                else:
-                    report = result['output']['github']['output']['values'][0]
-                    print('Commit count report returned ', report)
-                    synthesize_text.synthesize_text(
-                        'コミットカウントレポートによると、リポジトリ'
-                        + report[2] + ' へ' + report[0] + 'は、コミット数'
-                        + str(report[5]) + ' 件の貢献をしました')
+    handler = EVENT_HANDLERS.get(event.type)
+    if handler:
+        handler(event, assistant)
+
+    if event.type in FLUSH_EVENTS:
+        _out.flush()
 
 
 def main():
@@ -237,17 +572,30 @@ def main():
                         version='%(prog)s ' + Assistant.__version_str__())
 
     args = parser.parse_args()
-    with open(args.credentials, 'r') as f:
-        credentials = google.oauth2.credentials.Credentials(token=None,
-                                                            **json.load(f))
+
+    import faulthandler
+    faulthandler.enable()
+
+    # Other modules print to sys.stdout, which is pointed at the same
+    # buffer to keep their output in order with the events.
+    global _out
+    _out = sys.stdout = _open_buffered_stdout()
+
+    prewarm = threading.Thread(target=prewarm_synthesized_texts)
+    prewarm.daemon = True
+    prewarm.start()
+
+    credentials = google.oauth2.credentials.Credentials(
+        token=None,
+        **json_loads(pathlib.Path(args.credentials).read_bytes()))
 
     device_model_id = None
     last_device_id = None
     try:
-        with open(args.device_config) as f:
-            device_config = json.load(f)
-            device_model_id = device_config['model_id']
-            last_device_id = device_config.get('last_device_id', None)
+        device_config = json_loads(
+            pathlib.Path(args.device_config).read_bytes())
+        device_model_id = device_config['model_id']
+        last_device_id = device_config.get('last_device_id', None)
     except FileNotFoundError:
         pass
 
@@ -264,9 +612,18 @@ def main():
     with Assistant(credentials, device_model_id) as assistant:
         events = assistant.start()
 
+        # Threads started from here on inherit the CPU and the priority
+        # of the event loop, the Assistant's own threads do not.
+        _pin_current_thread(EVENT_LOOP_CPU)
+        try:
+            os.nice(EVENT_LOOP_NICENESS)
+        except (AttributeError, OSError) as e:
+            print('Failed to raise event loop priority: %s' % e,
+                  file=_out)
+
         device_id = assistant.device_id
-        print('device_model_id:', device_model_id)
-        print('device_id:', device_id + '\n')
+        print('device_model_id:', device_model_id, file=_out)
+        print('device_id:', device_id + '\n', file=_out)
 
         # Re-register if "device_id" is different from the last "device_id":
         if should_register or (device_id != last_device_id):
@@ -275,17 +632,28 @@ def main():
                                 device_model_id, device_id, args.nickname)
                 pathlib.Path(os.path.dirname(args.device_config)).mkdir(
                     exist_ok=True)
-                with open(args.device_config, 'w') as f:
-                    json.dump({
+                # Written to a temporary file first, so that a power loss
+                # cannot leave a truncated device config behind.
+                tmp = args.device_config + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(json_dumps({
                         'last_device_id': device_id,
                         'model_id': device_model_id,
-                    }, f)
+                    }))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, args.device_config)
             else:
-                print(WARNING_NOT_REGISTERED)
+                print(WARNING_NOT_REGISTERED, file=_out)
+
+        _out.flush()
 
+        # The startup query is sent once, on the first ON_START_FINISHED.
+        startup_query = args.query
         for event in events:
-            if event.type == EventType.ON_START_FINISHED and args.query:
-                assistant.send_text_query(args.query)
+            if startup_query and event.type == EventType.ON_START_FINISHED:
+                assistant.send_text_query(startup_query)
+                startup_query = None
 
             process_event(event, assistant)
 
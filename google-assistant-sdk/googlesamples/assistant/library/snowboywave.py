@@ -2,6 +2,7 @@
 
 import collections
 import pyaudio
+import threading
 import time
 import wave
 import os
@@ -13,26 +14,55 @@ DETECT_DING = os.path.join(TOP_DIR, "resources/ding.wav")
 DETECT_DONG = os.path.join(TOP_DIR, "resources/dong.wav")
 
 
+def load_audio_file(fname):
+    """Reads a wave file.
+
+    :param fname: wave file name or file object
+    :return: tuple of (frames, sample width, channels, frame rate)
+    """
+    wav = wave.open(fname, 'rb')
+    try:
+        return (wav.readframes(wav.getnframes()), wav.getsampwidth(),
+                wav.getnchannels(), wav.getframerate())
+    finally:
+        wav.close()
+
+
+# The ding and dong are played at every turn: keep them decoded in memory.
+_preloaded = {
+    DETECT_DING: load_audio_file(DETECT_DING),
+    DETECT_DONG: load_audio_file(DETECT_DONG),
+}
+
+# PortAudio is initialized once and shared by every playback.
+_audio = None
+_audio_lock = threading.Lock()
+
+
 def play_audio_file(fname=DETECT_DING):
     """Simple callback function to play a wave file. By default it plays
     a Ding sound.
 
-    :param str fname: wave file name
+    :param fname: wave file name or file object
     :return: None
     """
-    ding_wav = wave.open(fname, 'rb')
-    ding_data = ding_wav.readframes(ding_wav.getnframes())
-    audio = pyaudio.PyAudio()
-    stream_out = audio.open(
-        format=audio.get_format_from_width(ding_wav.getsampwidth()),
-        channels=ding_wav.getnchannels(),
-        rate=ding_wav.getframerate(), input=False, output=True)
-    stream_out.start_stream()
-    stream_out.write(ding_data)
-    time.sleep(0.2)
-    stream_out.stop_stream()
-    stream_out.close()
-    audio.terminate()
+    global _audio
+    if fname in _preloaded:
+        data, sample_width, channels, rate = _preloaded[fname]
+    else:
+        data, sample_width, channels, rate = load_audio_file(fname)
+    with _audio_lock:
+        if _audio is None:
+            _audio = pyaudio.PyAudio()
+        stream_out = _audio.open(
+            format=_audio.get_format_from_width(sample_width),
+            channels=channels,
+            rate=rate, input=False, output=True)
+        stream_out.start_stream()
+        stream_out.write(data)
+        time.sleep(0.2)
+        stream_out.stop_stream()
+        stream_out.close()
 
 
 if __name__ == '__main__':
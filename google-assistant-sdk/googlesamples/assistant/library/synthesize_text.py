@@ -22,13 +22,83 @@ Example usage:
 """
 
 import argparse
+import functools
+import hashlib
+import io
+import os
 import tempfile
 
 import snowboywave
 
+# Voice and audio encoding used by synthesize_audio(), by enum name.
+LANGUAGE_CODE = 'ja_JP'
+SSML_GENDER = 'FEMALE'
+AUDIO_ENCODING = 'LINEAR16'
+
+# Synthesized audio is also kept on disk so that it survives restarts.
+# Only the most recently used CACHE_MAX_FILES files are kept.
+CACHE_DIR = os.path.join(os.path.expanduser('~/.cache'),
+                         'googlesamples-assistant', 'tts')
+CACHE_MAX_FILES = 64
+
+
+# Each cached entry is a whole WAV clip of up to a few hundred KB, so only
+# a few are kept in memory; the others are read back from CACHE_DIR.
+MEMORY_CACHE_SIZE = 8
+
+
 # [START tts_synthesize_text]
-def synthesize_text(text):
-    """Synthesizes speech from the input string of text."""
+@functools.lru_cache(maxsize=MEMORY_CACHE_SIZE)
+def synthesize_audio(text):
+    """Synthesizes speech from the input string of text.
+
+    Results are cached in memory and in CACHE_DIR, so repeated answers
+    skip the round-trip to the Text-To-Speech API.
+
+    Returns: the synthesized audio as LINEAR16 WAV bytes.
+    """
+    key = '\0'.join((LANGUAGE_CODE, SSML_GENDER, AUDIO_ENCODING, text))
+    cache_file = os.path.join(
+        CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.wav')
+    try:
+        with open(cache_file, 'rb') as f:
+            audio_content = f.read()
+        # The modification time orders the files for _prune_cache().
+        os.utime(cache_file)
+        return audio_content
+    except (IOError, OSError):
+        pass
+
+    audio_content = _synthesize_speech(text)
+
+    try:
+        if not os.path.isdir(CACHE_DIR):
+            os.makedirs(CACHE_DIR)
+        # A unique temporary file per write, since several threads may
+        # synthesize the same text at once.
+        fd, tmp_file = tempfile.mkstemp(suffix='.tmp', dir=CACHE_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(audio_content)
+        os.replace(tmp_file, cache_file)
+        _prune_cache()
+    except OSError as e:
+        print('Failed to cache synthesized audio: %s' % e)
+    return audio_content
+
+
+def _prune_cache():
+    """Removes all but the CACHE_MAX_FILES most recently used files."""
+    paths = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR)
+             if name.endswith('.wav')]
+    if len(paths) <= CACHE_MAX_FILES:
+        return
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[CACHE_MAX_FILES:]:
+        os.remove(path)
+
+
+def _synthesize_speech(text):
+    """Calls the Text-To-Speech API, returning LINEAR16 WAV bytes."""
     from google.cloud import texttospeech
     client = texttospeech.TextToSpeechClient()
 
@@ -37,25 +107,22 @@ def synthesize_text(text):
     # Note: the voice can also be specified by name.
     # Names of voices can be retrieved with client.list_voices().
     voice = texttospeech.types.VoiceSelectionParams(
-        #language_code='en-US',
-        language_code='ja_JP',
-        ssml_gender=texttospeech.enums.SsmlVoiceGender.FEMALE)
+        language_code=LANGUAGE_CODE,
+        ssml_gender=getattr(texttospeech.enums.SsmlVoiceGender, SSML_GENDER))
 
     audio_config = texttospeech.types.AudioConfig(
-        #audio_encoding=texttospeech.enums.AudioEncoding.MP3)
-        audio_encoding=texttospeech.enums.AudioEncoding.LINEAR16)
+        audio_encoding=getattr(texttospeech.enums.AudioEncoding,
+                               AUDIO_ENCODING))
 
     response = client.synthesize_speech(input_text, voice, audio_config)
 
-    with tempfile.NamedTemporaryFile() as ntf:
-        # The response's audio_content is binary.
-        # with open('output.mp3', 'wb') as out:
-        with open(ntf.name, 'wb') as out:
-            out.write(response.audio_content)
-            #print('Audio content written to file "output.mp3"')
-            print('Audio content written to file ' + ntf.name)
-            out.seek(0)
-            snowboywave.play_audio_file(ntf.name)
+    # The response's audio_content is binary.
+    return response.audio_content
+
+
+def synthesize_text(text):
+    """Synthesizes speech from the input string of text and plays it."""
+    snowboywave.play_audio_file(io.BytesIO(synthesize_audio(text)))
 # [END tts_synthesize_text]
 
 
@@ -164,11 +164,16 @@ class ConversationStreamTest(unittest.TestCase):
         self.assertEqual(b'\xd4\x00\xa9\x01',
                          audio_helpers.normalize_audio_buffer(
                              b'\x01\x02\x03\x04', 50))
+        self.assertEqual(b'\xd4\x00\xa9\x01',
+                         audio_helpers.normalize_audio_buffer(
+                             memoryview(b'\x01\x02\x03\x04'), 50))
 
     def test_align_buf(self):
         self.assertEqual(b'foo\0', audio_helpers.align_buf(b'foo', 2))
         self.assertEqual(b'foobar', audio_helpers.align_buf(b'foobar', 2))
         self.assertEqual(b'foo\0\0\0', audio_helpers.align_buf(b'foo', 6))
+        self.assertEqual(b'foo\0',
+                         audio_helpers.align_buf(memoryview(b'foo'), 2))
 
 
 if __name__ == '__main__':
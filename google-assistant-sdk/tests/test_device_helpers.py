@@ -76,6 +76,19 @@ class DeviceRequestHandlerTest(unittest.TestCase):
         concurrent.futures.wait(fs)
         self.assertEqual(self.handler_called, 'some-arg')
 
+    def test_handler_result(self):
+        device_handler = device_helpers.DeviceRequestHandler(
+            'some-device',
+        )
+        device_handler.command('SOME_COMMAND')(lambda arg: [arg])
+        device_request = build_device_request('some-device',
+                                              'SOME_COMMAND',
+                                              'some-arg')
+        fs = device_handler(device_request)
+        self.assertEqual(len(fs), 1)
+        concurrent.futures.wait(fs)
+        self.assertEqual(fs[0].result(), ['some-arg'])
+
     def test_different_device(self):
         device_handler = device_helpers.DeviceRequestHandler(
             'some-device',